@@ -1,6 +1,8 @@
 import importlib.resources as resources
+import json
 import subprocess
 import time
+from concurrent.futures import ThreadPoolExecutor
 from hashlib import md5
 from pathlib import Path
 from shutil import make_archive, rmtree
@@ -9,15 +11,18 @@ import typer
 from rich import print
 from rich.progress import Progress, SpinnerColumn, TextColumn
 from rich.prompt import Confirm, Prompt
+from rich.table import Table
 from semver import Version
 from typing_extensions import Annotated
 
-from lubber.building import build_project
+from lubber.building import build_project, get_coop_lib_dir
 from lubber.models.config import GlobalConfig
 from lubber.models.project import LockedDependency, LockFile, Project
 from lubber.models.state import State
-from lubber.resolver import install, resolve
-from lubber.resolver.types import Dependency
+from lubber.resolver import install, package_index, resolve
+from lubber.resolver.dependencies import Dependency
+from lubber.symbols import open_symbol_index
+from lubber.transform.profiling import PROFILE_LOG, read_profile_log
 from lubber.utils import get_username, is_exe, suggest_mod_id, validate_mod_id
 
 app = typer.Typer(
@@ -258,31 +263,40 @@ def restore(ctx: typer.Context) -> bool:
 
 
 @app.command()
-def build(ctx: typer.Context, release: bool = False, zip: bool = False):
+def build(
+    ctx: typer.Context,
+    release: bool = False,
+    zip: bool = False,
+    profile: Annotated[
+        bool, typer.Option(help="Time every hook callback while the mod runs.")
+    ] = False,
+):
     """
     Builds the mod.
     """
 
-    if not restore(ctx):
-        raise Exception(
-            "Project restore failed. All issues must be fixed before building."
-        )
+    project_file = state.project_path / "lubber.toml"
+    if not project_file.is_file():
+        raise Exception("No project file in directory.")
 
-    project: Project = Project.get_config()
+    project: Project = Project.load_config(project_file)
 
     if not is_exe(state.config.paths.lua_exe):
         raise Exception("Couldn't find lua executable.")
     if not is_exe(state.config.paths.luac_exe):
         raise Exception("Couldn't find luac executable.")
 
-    print(f"[blue]Building '{project.mod.name}'...")
-
     begin_at = time.clock_gettime_ns(time.CLOCK_REALTIME)
 
     output_root = state.project_path / project.directories.output
     output_dir = output_root / project.mod.name
 
-    build_project(state, project, output_dir, release)
+    # Restore in the background, the build waits on it only where it has to
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        restoring = executor.submit(restore, ctx)
+
+        print(f"[blue]Building '{project.mod.name}'...")
+        build_project(state, project, output_dir, release, restoring, profile)
 
     if zip:
         make_archive(
@@ -305,6 +319,135 @@ def build(ctx: typer.Context, release: bool = False, zip: bool = False):
     print(f"[blue]'{project.mod.name}' built in {time_taken_s}s.")
 
 
+@app.command()
+def search(
+    query: Annotated[
+        str, typer.Argument(help="Part of the package name to look for.")
+    ] = "",
+):
+    """
+    Searches the local package index. Works offline.
+    """
+
+    packages = package_index.search(query)
+    if len(packages) == 0:
+        print(
+            "[yellow]No packages found. The index is filled in when a project is restored."
+        )
+        return
+
+    table = Table("Package", "Source", "Latest", "Versions")
+    for package in packages:
+        table.add_row(
+            package.name, package.provider, str(package.latest), str(package.count)
+        )
+    print(table)
+
+
+@app.command()
+def versions(
+    name: Annotated[str, typer.Argument(help="Name of the package.")],
+    version_range: Annotated[
+        str, typer.Argument(help="Only show versions matching this range.")
+    ] = None,
+):
+    """
+    Lists indexed versions of a package. Works offline.
+    """
+
+    if version_range is not None:
+        version_range = version_range.replace("^", ">=")
+
+    indexed = package_index.query(name, version_range)
+    if len(indexed) == 0:
+        print(f"[yellow]No indexed versions of '{name}' matched.")
+        return
+
+    table = Table("Version", "Source", "Location")
+    for entry in indexed:
+        table.add_row(str(entry.version), entry.provider, entry.location)
+    print(table)
+
+
+@app.command()
+def symbols(
+    query: Annotated[str, typer.Argument(help="Start of the symbol name.")],
+    fuzzy: Annotated[
+        bool, typer.Option(help="Match the query's characters anywhere, in order.")
+    ] = False,
+    limit: int = 50,
+    output_json: Annotated[
+        bool, typer.Option("--json", help="Print matches as JSON lines.")
+    ] = False,
+):
+    """
+    Looks up sm64coopdx functions, struct fields and constants.
+    """
+
+    lib_dir = get_coop_lib_dir(state.project_path)
+    if lib_dir is None:
+        raise Exception("sm64coopdx isn't installed. Restore the project first.")
+
+    with open_symbol_index(lib_dir) as index:
+        if fuzzy:
+            found = index.fuzzy(query, limit)
+        else:
+            found = index.prefix(query, limit)
+
+    if output_json:
+        for symbol in found:
+            typer.echo(json.dumps(symbol.__dict__))
+        return
+
+    if len(found) == 0:
+        print(f"[yellow]No symbols matched '{query}'.")
+        return
+
+    table = Table("Symbol", "Kind", "Signature", "Defined in")
+    for symbol in found:
+        table.add_row(
+            symbol.name, symbol.kind, symbol.signature, f"{symbol.file}:{symbol.line}"
+        )
+    print(table)
+
+
+profile_app = typer.Typer(no_args_is_help=True)
+app.add_typer(profile_app, name="profile", help="Inspects profiling builds.")
+
+
+@profile_app.command("report")
+def profile_report(
+    log: Annotated[
+        Path, typer.Argument(help="Profile log, or a game log containing samples.")
+    ] = Path(PROFILE_LOG),
+    limit: int = 20,
+):
+    """
+    Ranks the hooks of a profiling build by the time spent in them.
+    """
+
+    if not log.is_file():
+        raise Exception(f"Couldn't find profile log '{log}'.")
+
+    hooks = read_profile_log(log)
+    if len(hooks) == 0:
+        print("[yellow]The log has no profiling samples.")
+        return
+
+    total = sum(hook.total for hook in hooks)
+    table = Table("Hook", "Calls", "Total (ms)", "Mean (µs)", "Max (µs)", "Share")
+    for hook in hooks[:limit]:
+        table.add_row(
+            hook.label,
+            str(hook.calls),
+            f"{hook.total * 1000:.3f}",
+            f"{hook.mean * 1_000_000:.1f}",
+            f"{hook.max * 1_000_000:.1f}",
+            f"{hook.total / total * 100:.1f}%" if total > 0 else "-",
+        )
+    print(table)
+
+
 def remove_pat(app_dir: Path):
     pat_file = app_dir / "pat"
     if pat_file.is_file():
@@ -325,5 +468,7 @@ def main(project: Path = typer.Option(None, help="Specify the path of the projec
         state.app_dir.mkdir(parents=True, exist_ok=True)
         state.config.save(config_path)
 
+    package_index.open(state.app_dir / "index.db")
+
     if project is not None:
         state.project_path = project.absolute()
@@ -1,30 +1,244 @@
 import subprocess
+from concurrent.futures import Future
 from math import floor
 from pathlib import Path
-from shutil import copy2, copytree, rmtree
+from shutil import copy2, copytree, move, rmtree
+from typing import Optional
 
 from numpy import emath, sort
+from rich import print
 
 from lubber.models.state import State
-from lubber.models.project import Project
+from lubber.models.project import LockFile, Project
+from lubber.report import (
+    assets_report,
+    chunk_report,
+    format_size,
+    load_report,
+    print_report,
+    save_report,
+)
+from lubber.transform.constants import inline_constants, load_constants
+from lubber.transform.hoisting import hoist_globals, load_functions
+from lubber.transform.lexer import LuaSyntaxError, tokenize
+from lubber.transform.profiling import instrument_hooks
+from lubber.transform.scope import scan
 
 
-def build_project(state: State, project: Project, output_path: Path, release: bool):
+def get_coop_lib_dir(project_path: Path) -> Optional[Path]:
+    lockfile_file = project_path / ".lubber" / "lock.toml"
+    if not lockfile_file.is_file():
+        return None
+    lock = LockFile.load_config(lockfile_file).dependencies.get("sm64coopdx")
+    if lock is None:
+        return None
+    lib_dir = project_path / ".lubber" / "libs" / f"sm64coopdx@{lock.version}"
+    return lib_dir if lib_dir.is_dir() else None
+
+
+def transform_sources(
+    project_path: Path,
+    src_dir: Path,
+    stage_dir: Path,
+    ordered_lua: list[Path],
+    inline: bool,
+    hoist: bool,
+    profile: bool,
+    restoring: Optional[Future] = None,
+):
+    if stage_dir.is_dir():
+        rmtree(stage_dir, ignore_errors=True)
+
+    sources: dict[Path, str] = {}
+    assigned: set[str] = set()
+    assigned_fields: set[str] = set()
+    for rel_path in ordered_lua:
+        source = (src_dir / rel_path).read_text()
+        sources[rel_path] = source
+        try:
+            result = scan(tokenize(source))
+            assigned.update(result.assigned)
+            assigned_fields.update(result.assigned_fields)
+        except LuaSyntaxError:
+            pass
+
+    if profile:
+        instrumented = 0
+        for rel_path, source in sources.items():
+            try:
+                source, count = instrument_hooks(
+                    source, rel_path.as_posix(), assigned
+                )
+                sources[rel_path] = source
+                instrumented += count
+            except LuaSyntaxError:
+                pass
+        print(f"Instrumented {instrumented} hooks for profiling.")
+
+    lib_dir = None
+    if inline or hoist:
+        # The passes below read the installed sm64coopdx definitions
+        wait_for_restore(restoring)
+        lib_dir = get_coop_lib_dir(project_path)
+
+    constants = {}
+    if inline:
+        if lib_dir is not None:
+            constants = load_constants(lib_dir)
+        if len(constants) == 0:
+            print(
+                "[yellow]No sm64coopdx constants are installed, so none will be inlined."
+            )
+
+    functions = set()
+    if hoist and lib_dir is not None:
+        functions = load_functions(lib_dir)
+
+    inlined = 0
+    hoisted = 0
+    hoisted_lookups = 0
+    for rel_path, source in sources.items():
+        try:
+            if len(constants) > 0:
+                source, count = inline_constants(source, constants, assigned)
+                inlined += count
+            if hoist:
+                source, count, lookups = hoist_globals(
+                    source, functions, assigned, assigned_fields
+                )
+                hoisted += count
+                hoisted_lookups += lookups
+        except LuaSyntaxError:
+            # Left as is so luac reports the error
+            pass
+        stage_file = stage_dir / rel_path
+        stage_file.parent.mkdir(parents=True, exist_ok=True)
+        stage_file.write_text(source)
+
+    if len(constants) > 0:
+        print(f"Inlined {inlined} constant lookups.")
+    if hoist:
+        print(f"Hoisted {hoisted} globals into locals, covering {hoisted_lookups} lookups.")
+
+
+def stage_assets(
+    project_path: Path, project: Project, output_path: Path, release: bool
+):
+    assets_dir = project_path / project.directories.assets
+
+    if release:
+        actors_dir = assets_dir / "actors"
+        if actors_dir.is_dir():
+            (output_path / "actors").mkdir(parents=True, exist_ok=True)
+            for asset in actors_dir.glob("*.bin"):
+                copy2(asset, output_path / "actors")
+            for asset in actors_dir.glob("*.col"):
+                copy2(asset, output_path / "actors")
+
+        data_dir = assets_dir / "data"
+        if data_dir.is_dir():
+            (output_path / "data").mkdir(parents=True, exist_ok=True)
+            for asset in data_dir.glob("*.bhv"):
+                copy2(asset, output_path / "data")
+
+        textures_dir = assets_dir / "textures"
+        if textures_dir.is_dir():
+            (output_path / "textures").mkdir(parents=True, exist_ok=True)
+            for asset in textures_dir.glob("*.png"):
+                copy2(asset, output_path / "textures")
+            for asset in textures_dir.rglob("*.tex"):
+                copy2(asset, output_path / "textures")
+
+        levels_dir = assets_dir / "levels"
+        if levels_dir.is_dir():
+            (output_path / "levels").mkdir(parents=True, exist_ok=True)
+            for asset in levels_dir.glob("*.lvl"):
+                copy2(asset, output_path / "levels")
+
+        sounds_dir = assets_dir / "sound"
+        if sounds_dir.is_dir():
+            (output_path / "sound").mkdir(parents=True, exist_ok=True)
+            for asset in sounds_dir.glob("*.m64"):
+                copy2(asset, output_path / "sound")
+            for asset in sounds_dir.glob("*.mp3"):
+                copy2(asset, output_path / "sound")
+            for asset in sounds_dir.glob("*.aiff"):
+                copy2(asset, output_path / "sound")
+            for asset in sounds_dir.glob("*.ogg"):
+                copy2(asset, output_path / "sound")
+    else:
+        if (assets_dir / "actors").is_dir():
+            copytree(assets_dir / "actors", output_path / "actors")
+        if (assets_dir / "data").is_dir():
+            copytree(assets_dir / "data", output_path / "data")
+        if (assets_dir / "textures").is_dir():
+            copytree(assets_dir / "textures", output_path / "textures")
+        if (assets_dir / "levels").is_dir():
+            copytree(assets_dir / "levels", output_path / "levels")
+        if (assets_dir / "sound").is_dir():
+            copytree(assets_dir / "sound", output_path / "sound")
+
+
+def report_size(
+    cache_dir: Path,
+    project: Project,
+    output_path: Path,
+    chunks: list[tuple[str, Path, Path, Path]],
+):
+    report = {"chunks": {}, "assets": assets_report(output_path)}
+    for name, compiled_file, unstripped_file, source_file in chunks:
+        if not compiled_file.is_file() or not unstripped_file.is_file():
+            continue
+        report["chunks"][name] = chunk_report(
+            compiled_file, unstripped_file, source_file.read_text()
+        )
+    report["total"] = sum(report["assets"].values())
+
+    print_report(report, load_report(cache_dir))
+    save_report(cache_dir, report)
+
+    max_size = project.build.max_size
+    if max_size is not None and report["total"] > max_size:
+        raise Exception(
+            f"The build is {format_size(report['total'])}, over the max_size budget of {format_size(max_size)}."
+        )
+
+
+def wait_for_restore(restoring: Optional[Future]):
+    if restoring is not None and not restoring.result():
+        raise Exception(
+            "Project restore failed. All issues must be fixed before building."
+        )
+
+
+def build_project(
+    state: State,
+    project: Project,
+    output_path: Path,
+    release: bool,
+    restoring: Optional[Future] = None,
+    profile: bool = False,
+):
+    """
+    Builds the project into the output path. When a restore is still running
+    in the background, this only waits for it once installed libraries are
+    needed, and always before the output is replaced.
+    """
     project_path = state.project_path
 
     cache_dir = project_path / ".lubber"
     obj_dir = cache_dir / "obj"
     obj_dir.mkdir(parents=True, exist_ok=True)
 
-    # Empty output directory
-    if output_path.is_dir():
-        for path in output_path.iterdir():
-            if path.is_file():
-                path.unlink(missing_ok=True)
-            elif path.is_dir():
-                rmtree(path, ignore_errors=True)
+    # Staged away from the output until restore has passed, so a failed
+    # build doesn't leave a loadable mod behind
+    stage_path = obj_dir / "output"
+    if stage_path.is_dir():
+        rmtree(stage_path, ignore_errors=True)
+    stage_path.mkdir(parents=True, exist_ok=True)
 
-    output_path.mkdir(parents=True, exist_ok=True)
+    # Compile assets
+    stage_assets(project_path, project, stage_path, release)
 
     # Build lua source files
     src_dir = project_path / project.directories.source
@@ -37,7 +251,7 @@ def build_project(state: State, project: Project, output_path: Path, release: bo
     ordered_lua = []
     for path in src_dir.rglob("*.lua", case_sensitive=False):
         if path.name == "main.lua":
-            main_lua_file = output_path / "main.lua"
+            main_lua_file = stage_path / "main.lua"
             main_lua = ""
             for line in path.read_text().splitlines(keepends=False):
                 if not line.startswith("--"):
@@ -49,10 +263,45 @@ def build_project(state: State, project: Project, output_path: Path, release: bo
 
     ordered_lua = sort(ordered_lua)
 
+    inline = release and project.build.inline_constants
+    hoist = project.build.hoist_globals
+    compile_dir = src_dir
+    if inline or hoist or profile:
+        compile_dir = obj_dir / "src"
+        transform_sources(
+            project_path,
+            src_dir,
+            compile_dir,
+            ordered_lua,
+            inline,
+            hoist,
+            profile,
+            restoring,
+        )
+
+    unstripped_dir = obj_dir / "unstripped"
+    if release:
+        if unstripped_dir.is_dir():
+            rmtree(unstripped_dir, ignore_errors=True)
+        unstripped_dir.mkdir(parents=True, exist_ok=True)
+
     compiled_lua = []
+    reported_chunks: list[tuple[str, Path, Path, Path]] = []
     for rel_path in ordered_lua:
         in_file = rel_path
         out_file = obj_dir / (str(rel_path).replace("/", ".") + "c")
+        if release:
+            # Compiled again with debug info for the size report
+            unstripped_file = unstripped_dir / out_file.name
+            unstripped_retcode = subprocess.call(
+                [
+                    state.config.paths.luac_exe,
+                    "-o",
+                    str(unstripped_file),
+                    str(in_file),
+                ],
+                cwd=compile_dir,
+            )
         retcode = subprocess.call(
             [
                 state.config.paths.luac_exe,
@@ -61,12 +310,16 @@ def build_project(state: State, project: Project, output_path: Path, release: bo
                 str(out_file),
                 str(in_file),
             ],
-            cwd=src_dir,
+            cwd=compile_dir,
         )
         if not retcode == 0:
             print(
                 f"[red]An error occurred compiling '{in_file}'. Trying to finish anyway..."
             )
+        elif release and unstripped_retcode == 0:
+            reported_chunks.append(
+                (str(rel_path), out_file, unstripped_file, compile_dir / rel_path)
+            )
 
         compiled_lua.append(out_file)
 
@@ -74,7 +327,7 @@ def build_project(state: State, project: Project, output_path: Path, release: bo
         single_file_name = "main64.luac"
         if project.build.shorten_names:
             single_file_name = "64.luac"
-        out_file = output_path / single_file_name
+        out_file = stage_path / single_file_name
         retcode = subprocess.call(
             [
                 state.config.paths.luac_exe,
@@ -97,60 +350,22 @@ def build_project(state: State, project: Project, output_path: Path, release: bo
                     out_name += chr(ord("a") + round(char_code))
                 out_name += ".luac"
                 short_counter += 1
-            out_file = output_path / out_name
+            out_file = stage_path / out_name
             copy2(compiled_file, out_file)
 
-    # Compile assets
-    assets_dir = project_path / project.directories.assets
-
-    if release:
-        actors_dir = assets_dir / "actors"
-        if actors_dir.is_dir():
-            (output_path / "actors").mkdir(parents=True, exist_ok=True)
-            for asset in actors_dir.glob("*.bin"):
-                copy2(asset, output_path / "actors")
-            for asset in actors_dir.glob("*.col"):
-                copy2(asset, output_path / "actors")
+    wait_for_restore(restoring)
 
-        data_dir = assets_dir / "data"
-        if data_dir.is_dir():
-            (output_path / "data").mkdir(parents=True, exist_ok=True)
-            for asset in data_dir.glob("*.bhv"):
-                copy2(asset, output_path / "data")
-
-        textures_dir = assets_dir / "textures"
-        if textures_dir.is_dir():
-            (output_path / "textures").mkdir(parents=True, exist_ok=True)
-            for asset in textures_dir.glob("*.png"):
-                copy2(asset, output_path / "textures")
-            for asset in textures_dir.rglob("*.tex"):
-                copy2(asset, output_path / "textures")
+    # Empty output directory
+    if output_path.is_dir():
+        for path in output_path.iterdir():
+            if path.is_file():
+                path.unlink(missing_ok=True)
+            elif path.is_dir():
+                rmtree(path, ignore_errors=True)
 
-        levels_dir = assets_dir / "levels"
-        if levels_dir.is_dir():
-            (output_path / "levels").mkdir(parents=True, exist_ok=True)
-            for asset in levels_dir.glob("*.lvl"):
-                copy2(asset, output_path / "levels")
+    output_path.mkdir(parents=True, exist_ok=True)
+    for path in stage_path.iterdir():
+        move(path, output_path / path.name)
 
-        sounds_dir = assets_dir / "sound"
-        if sounds_dir.is_dir():
-            (output_path / "sound").mkdir(parents=True, exist_ok=True)
-            for asset in sounds_dir.glob("*.m64"):
-                copy2(asset, output_path / "sound")
-            for asset in sounds_dir.glob("*.mp3"):
-                copy2(asset, output_path / "sound")
-            for asset in sounds_dir.glob("*.aiff"):
-                copy2(asset, output_path / "sound")
-            for asset in sounds_dir.glob("*.ogg"):
-                copy2(asset, output_path / "sound")
-    else:
-        if (assets_dir / "actors").is_dir():
-            copytree(assets_dir / "actors", output_path / "actors")
-        if (assets_dir / "data").is_dir():
-            copytree(assets_dir / "data", output_path / "data")
-        if (assets_dir / "textures").is_dir():
-            copytree(assets_dir / "textures", output_path / "textures")
-        if (assets_dir / "levels").is_dir():
-            copytree(assets_dir / "levels", output_path / "levels")
-        if (assets_dir / "sound").is_dir():
-            copytree(assets_dir / "sound", output_path / "sound")
\ No newline at end of file
+    if release:
+        report_size(cache_dir, project, output_path, reported_chunks)
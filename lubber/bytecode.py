@@ -0,0 +1,166 @@
+import struct
+from dataclasses import dataclass, field
+from typing import Iterator
+
+LUA_SIGNATURE = b"\x1bLua"
+LUAC_VERSION = 0x53
+LUAC_DATA = b"\x19\x93\r\n\x1a\n"
+LUAC_INT = 0x5678
+
+# Constant tags from lobject.h
+LUA_TNIL = 0
+LUA_TBOOLEAN = 1
+LUA_TNUMFLT = 3
+LUA_TNUMINT = 3 | (1 << 4)
+LUA_TSHRSTR = 4
+LUA_TLNGSTR = 4 | (1 << 4)
+
+
+class BytecodeError(Exception):
+    pass
+
+
+@dataclass
+class Function:
+    line_defined: int
+    last_line_defined: int
+    instructions: int
+    constants: int
+    size: int
+    """Bytes this function takes up in the chunk, not counting nested functions."""
+    functions: list["Function"] = field(default_factory=list)
+
+    def walk(self) -> Iterator["Function"]:
+        yield self
+        for function in self.functions:
+            yield from function.walk()
+
+
+class _Reader:
+    def __init__(self, data: bytes):
+        self.data = data
+        self.pos = 0
+        self.endian = "<"
+        self.int_format = "i"
+        self.size_t_format = "Q"
+        self.integer_format = "q"
+        self.number_format = "d"
+
+    def read(self, size: int) -> bytes:
+        if self.pos + size > len(self.data):
+            raise BytecodeError("Chunk ended unexpectedly.")
+        value = self.data[self.pos : self.pos + size]
+        self.pos += size
+        return value
+
+    def unpack(self, format: str):
+        size = struct.calcsize(self.endian + format)
+        return struct.unpack(self.endian + format, self.read(size))[0]
+
+    def byte(self) -> int:
+        return self.read(1)[0]
+
+    def int(self) -> int:
+        return self.unpack(self.int_format)
+
+    def string(self) -> bytes:
+        size = self.byte()
+        if size == 0xFF:
+            size = self.unpack(self.size_t_format)
+        if size == 0:
+            return b""
+        return self.read(size - 1)
+
+
+def _format_for(size: int, signed: bool) -> str:
+    formats = {4: "i", 8: "q"} if signed else {4: "I", 8: "Q"}
+    if size not in formats:
+        raise BytecodeError(f"Unsupported type size {size}.")
+    return formats[size]
+
+
+def _read_header(reader: _Reader):
+    if reader.read(4) != LUA_SIGNATURE:
+        raise BytecodeError("Not a precompiled Lua chunk.")
+    if reader.byte() != LUAC_VERSION:
+        raise BytecodeError("Only Lua 5.3 chunks are supported.")
+    reader.byte()  # format
+    if reader.read(6) != LUAC_DATA:
+        raise BytecodeError("Chunk is corrupted.")
+
+    int_size, size_t_size, instruction_size, integer_size, number_size = (
+        reader.read(5)
+    )
+    if instruction_size != 4 or number_size != 8:
+        raise BytecodeError("Unsupported instruction or number size.")
+    reader.int_format = _format_for(int_size, True)
+    reader.size_t_format = _format_for(size_t_size, False)
+    reader.integer_format = _format_for(integer_size, True)
+
+    check = reader.read(integer_size)
+    if int.from_bytes(check, "big") == LUAC_INT:
+        reader.endian = ">"
+    reader.read(number_size)
+
+
+def _read_function(reader: _Reader) -> Function:
+    start = reader.pos
+    reader.string()  # source
+    line_defined = reader.int()
+    last_line_defined = reader.int()
+    reader.read(3)  # numparams, is_vararg, maxstacksize
+
+    instructions = reader.int()
+    reader.read(instructions * 4)
+
+    constants = reader.int()
+    for _ in range(constants):
+        tag = reader.byte()
+        if tag == LUA_TBOOLEAN:
+            reader.byte()
+        elif tag == LUA_TNUMFLT:
+            reader.read(8)
+        elif tag == LUA_TNUMINT:
+            reader.unpack(reader.integer_format)
+        elif tag in (LUA_TSHRSTR, LUA_TLNGSTR):
+            reader.string()
+        elif tag != LUA_TNIL:
+            raise BytecodeError(f"Unknown constant type {tag}.")
+
+    upvalues = reader.int()
+    reader.read(upvalues * 2)
+
+    functions: list[Function] = []
+    nested_size = 0
+    for _ in range(reader.int()):
+        function = _read_function(reader)
+        functions.append(function)
+        nested_size += sum(nested.size for nested in function.walk())
+
+    lines = reader.int()
+    reader.read(lines * struct.calcsize(reader.int_format))
+    for _ in range(reader.int()):
+        reader.string()
+        reader.int()
+        reader.int()
+    for _ in range(reader.int()):
+        reader.string()
+
+    return Function(
+        line_defined=line_defined,
+        last_line_defined=last_line_defined,
+        instructions=instructions,
+        constants=constants,
+        size=reader.pos - start - nested_size,
+        functions=functions,
+    )
+
+
+def read_chunk(data: bytes) -> Function:
+    """
+    Reads the function prototypes out of a chunk compiled by luac 5.3.
+    """
+    reader = _Reader(data)
+    _read_header(reader)
+    reader.byte()  # main closure upvalue count
+    return _read_function(reader)
@@ -0,0 +1,80 @@
+if __lubber_profile == nil then
+    local clock = clock_elapsed_f64 or (os ~= nil and os.clock) or clock_elapsed
+    local interval = 5
+    local stats = {}
+    local labels = {}
+    local last_flush = clock()
+
+    local function emit(line)
+        if io ~= nil and io.open ~= nil then
+            local file = io.open("lubber-profile.log", "a")
+            if file ~= nil then
+                file:write(line, "\n")
+                file:close()
+                return
+            end
+        end
+        print(line)
+    end
+
+    local function flush()
+        last_flush = clock()
+        for _, label in ipairs(labels) do
+            local stat = stats[label]
+            if stat.calls > 0 then
+                emit(string.format("lubber-profile\t%s\t%d\t%.9f\t%.9f", label, stat.calls, stat.total, stat.max))
+                stat.calls = 0
+                stat.total = 0
+                stat.max = 0
+            end
+        end
+    end
+
+    local function wrap(label, fn)
+        if type(fn) ~= "function" then
+            return fn
+        end
+        local stat = stats[label]
+        if stat == nil then
+            stat = { calls = 0, total = 0, max = 0 }
+            stats[label] = stat
+            labels[#labels + 1] = label
+        end
+        local function finish(start, ...)
+            local elapsed = clock() - start
+            stat.calls = stat.calls + 1
+            stat.total = stat.total + elapsed
+            if elapsed > stat.max then
+                stat.max = elapsed
+            end
+            if start - last_flush >= interval then
+                flush()
+            end
+            return ...
+        end
+        return function(...)
+            local start = clock()
+            return finish(start, fn(...))
+        end
+    end
+
+    __lubber_profile = {
+        flush = flush,
+        stats = stats,
+        hook_event = function(label, event, fn, ...)
+            return hook_event(event, wrap(label, fn), ...)
+        end,
+        hook_mario_action = function(label, action, fns, ...)
+            if type(fns) == "table" then
+                local wrapped = {}
+                for key, value in pairs(fns) do
+                    wrapped[key] = wrap(label .. " " .. tostring(key), value)
+                end
+                fns = wrapped
+            else
+                fns = wrap(label, fns)
+            end
+            return hook_mario_action(action, fns, ...)
+        end,
+    }
+end
@@ -1,5 +1,5 @@
 from dataclasses import dataclass, field
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 from fancy_dataclass import ConfigDataclass, TOMLDataclass
 from semver import Version
@@ -29,6 +29,10 @@ class ProjectDirectories(TOMLDataclass):
 class ProjectBuildOptions(TOMLDataclass):
     output_single_file: bool = False
     shorten_names: bool = False
+    inline_constants: bool = True
+    hoist_globals: bool = False
+    max_size: Optional[int] = None
+    """Largest total size in bytes a release build may be."""
 
 
 @dataclass
@@ -0,0 +1,161 @@
+import json
+import re
+from pathlib import Path
+from typing import Optional
+
+from rich import print
+from rich.table import Table
+
+from lubber.bytecode import BytecodeError, read_chunk
+
+REPORT_FILE = "build-report.json"
+TOP_FUNCTIONS = 10
+
+_function_name_regex = re.compile(
+    r"function\s+([\w.:]+)\s*\(|([\w.]+)\s*=\s*function\s*\("
+)
+
+
+def format_size(size: int) -> str:
+    if abs(size) < 1024:
+        return f"{size} B"
+    if abs(size) < 1024 * 1024:
+        return f"{size / 1024:.1f} KiB"
+    return f"{size / (1024 * 1024):.2f} MiB"
+
+
+def format_change(size: int, previous: Optional[int]) -> str:
+    if previous is None:
+        return "new"
+    change = size - previous
+    if change == 0:
+        return "-"
+    colour = "red" if change > 0 else "green"
+    sign = "+" if change > 0 else "-"
+    return f"[{colour}]{sign}{format_size(abs(change))}"
+
+
+def _function_label(source_lines: list[str], line: int) -> str:
+    if line == 0:
+        return "main chunk"
+    if line <= len(source_lines):
+        match = _function_name_regex.search(source_lines[line - 1])
+        if match is not None:
+            return f"{match.group(1) or match.group(2)} (line {line})"
+    return f"function at line {line}"
+
+
+def chunk_report(stripped_file: Path, unstripped_file: Path, source: str) -> dict:
+    """
+    Describes one compiled chunk: its size with and without debug info, and
+    the functions in it.
+    """
+    report = {
+        "size": stripped_file.stat().st_size,
+        "unstripped_size": unstripped_file.stat().st_size,
+        "functions": [],
+    }
+    try:
+        main = read_chunk(unstripped_file.read_bytes())
+    except BytecodeError:
+        return report
+
+    source_lines = source.splitlines()
+    for function in main.walk():
+        report["functions"].append(
+            {
+                "name": _function_label(source_lines, function.line_defined),
+                "line": function.line_defined,
+                "instructions": function.instructions,
+                "constants": function.constants,
+            }
+        )
+    return report
+
+
+def assets_report(output_path: Path) -> dict[str, int]:
+    """
+    Totals the output by asset category. Files at the top of the output,
+    the compiled scripts and main.lua, count as 'scripts'.
+    """
+    categories: dict[str, int] = {}
+    for path in output_path.rglob("*"):
+        if not path.is_file():
+            continue
+        rel_path = path.relative_to(output_path)
+        category = "scripts" if len(rel_path.parts) == 1 else rel_path.parts[0]
+        categories[category] = categories.get(category, 0) + path.stat().st_size
+    return dict(sorted(categories.items()))
+
+
+def load_report(cache_dir: Path) -> Optional[dict]:
+    report_file = cache_dir / REPORT_FILE
+    if not report_file.is_file():
+        return None
+    try:
+        return json.loads(report_file.read_text())
+    except json.JSONDecodeError:
+        return None
+
+
+def save_report(cache_dir: Path, report: dict):
+    (cache_dir / REPORT_FILE).write_text(json.dumps(report, indent=2))
+
+
+def print_report(report: dict, previous: Optional[dict]):
+    previous_chunks = previous["chunks"] if previous is not None else {}
+    previous_assets = previous["assets"] if previous is not None else {}
+
+    chunks = Table("Chunk", "Size", "Before -s", "Change", title="Scripts")
+    for name, chunk in report["chunks"].items():
+        previous_chunk = previous_chunks.get(name)
+        chunks.add_row(
+            name,
+            format_size(chunk["size"]),
+            format_size(chunk["unstripped_size"]),
+            format_change(
+                chunk["size"],
+                previous_chunk["size"] if previous_chunk is not None else None,
+            ),
+        )
+    for name in previous_chunks:
+        if name not in report["chunks"]:
+            chunks.add_row(name, "-", "-", "removed")
+    print(chunks)
+
+    functions = [
+        (name, function)
+        for name, chunk in report["chunks"].items()
+        for function in chunk["functions"]
+    ]
+    functions.sort(
+        key=lambda item: (item[1]["instructions"], item[1]["constants"]), reverse=True
+    )
+    if len(functions) > 0:
+        table = Table(
+            "Function", "Instructions", "Constants", title="Largest functions"
+        )
+        for name, function in functions[:TOP_FUNCTIONS]:
+            table.add_row(
+                f"{name}: {function['name']}",
+                str(function["instructions"]),
+                str(function["constants"]),
+            )
+        print(table)
+
+    assets = Table("Category", "Size", "Change", title="Output")
+    for category, size in report["assets"].items():
+        assets.add_row(
+            category, format_size(size), format_change(size, previous_assets.get(category))
+        )
+    for category in previous_assets:
+        if category not in report["assets"]:
+            assets.add_row(category, "-", "removed")
+    assets.add_row(
+        "[bold]total",
+        f"[bold]{format_size(report['total'])}",
+        format_change(
+            report["total"], previous["total"] if previous is not None else None
+        ),
+    )
+    print(assets)
@@ -6,6 +6,7 @@ from rich import print
 from lubber.models.project import DependencyList
 from lubber.resolver.coop import CoopResolver
 from lubber.resolver.dependencies import Dependency, Resolver
+from lubber.resolver.index import package_index
 
 resolvers: dict[str, Resolver] = {"coop": CoopResolver()}
 
@@ -27,7 +28,7 @@ def _resolve(full_name: str, version_range: str, resolved: dict[str, Dependency]
     set_resolver: str = None if len(name_splits) < 2 else name_splits[0] 
 
     version_range = version_range.replace("^", ">=")
-    dependency: Dependency = resolved.get(name, default=None)
+    dependency: Dependency = resolved.get(name, None)
 
     was_resolved: bool = dependency is not None
 
@@ -51,22 +52,23 @@ def _resolve(full_name: str, version_range: str, resolved: dict[str, Dependency]
             if dependency is None:
                 raise Exception(f"Dependency '{name} ({version_range})' doesn't exist in '{set_resolver}'.")
             dependency.provided_by = set_resolver
-        for id in resolvers:
-            resolver = resolvers[id]
-            dependency = resolver.resolve(name, version_range)
-            if dependency is not None:
-                dependency.provided_by = id
-                break
+        else:
+            for id in resolvers:
+                resolver = resolvers[id]
+                dependency = resolver.resolve(name, version_range)
+                if dependency is not None:
+                    dependency.provided_by = id
+                    break
 
+    if dependency is None:
+        raise Exception(
+            f"Dependency '{name}' of '{dependency_stack[-1]}' couldn't be found."
+        )
     if len(dependency.versions) == 0:
         raise Exception(
             f"Dependency '{name}' of '{dependency_stack[-1]}' was found, but no version matched {version_range}." if not was_resolved else
             f"Dependency '{name} ({version_range})' of '{dependency_stack[-1]}' is not compatible with '{name} ({dependency.version_ranges[-2]})'."
         )
-    if dependency is None:
-        raise Exception(
-            f"Dependency '{name}' of '{dependency_stack[-1]}' couldn't be found."
-        )
     
     dependency.needed_by.append(dependency_stack[-1])
 
@@ -74,7 +76,7 @@ def _resolve(full_name: str, version_range: str, resolved: dict[str, Dependency]
         dependency_stack.append(dependency.name)
         for dependency2 in dependency.relies_on:
             if dependency2.name in dependency_stack:
-                raise Exception(f"Cyclic dependency! ({*dependency_stack})")
+                raise Exception(f"Cyclic dependency! ({', '.join(dependency_stack)})")
             _resolve(dependency2.name, dependency2.version_range, resolved)
         dependency_stack.pop()
     resolved[name] = dependency
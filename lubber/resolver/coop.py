@@ -2,31 +2,59 @@ from pathlib import Path
 from typing import Optional
 
 import requests
-from github import Github
+from github import Github, GithubException
+from rich import print
 from semver import Version
 
 from lubber.resolver.dependencies import Dependency, Resolver
+from lubber.resolver.index import package_index
+from lubber.symbols import build_symbol_index
 
 github = Github()
 
 
 class CoopResolver(Resolver):
-    version_tag_map: dict[Version, str] = {}
+    id: str = "coop"
+
+    def refresh(self, name: str, force: bool = False):
+        if not force and not package_index.is_stale(self.id, name):
+            return
+
+        known_locations = package_index.known_locations(self.id, name)
+        entries: list[tuple[Version, str]] = []
+        try:
+            repo = github.get_repo("coop-deluxe/sm64coopdx")
+            for tag in repo.get_tags():
+                location = f"https://raw.githubusercontent.com/coop-deluxe/sm64coopdx/refs/tags/{tag.name}"
+                if location in known_locations:
+                    continue
+                version_str = tag.name.strip("v")
+                try:
+                    version = Version.parse(version_str, True)
+                except ValueError:
+                    continue
+                entries.append((version, location))
+        except (GithubException, requests.RequestException):
+            if not package_index.has_versions(self.id, name):
+                raise
+            print(f"[yellow]Couldn't refresh '{name}', using the local package index.")
+            return
+
+        package_index.update(self.id, name, entries)
 
     def resolve(self, name: str, version_range: str) -> Optional[Dependency]:
         if not name == "sm64coopdx":
             return None
 
-        versions = []
-        repo = github.get_repo("coop-deluxe/sm64coopdx")
-        for tag in repo.get_tags():
-            version_str = tag.name.strip("v")
-            version = Version.parse(version_str, True)
-            if not version.match(version_range):
-                continue
-            self.version_tag_map[version] = tag.name
-            versions.append(version)
-        versions.sort(reverse=True)
+        self.refresh(name)
+
+        indexed = package_index.query(name, version_range, provider=self.id)
+        if len(indexed) == 0:
+            # Nothing matched, so a newer tag may not be indexed yet
+            self.refresh(name, force=True)
+            indexed = package_index.query(name, version_range, provider=self.id)
+
+        versions = [entry.version for entry in indexed]
 
         return Dependency(
             name="sm64coopdx", version_ranges=[version_range], versions=versions
@@ -36,6 +64,11 @@ class CoopResolver(Resolver):
         if not dependency.provided_by == "coop":
             return False
 
+        version = dependency.versions[0]
+        location = package_index.location(self.id, dependency.name, version)
+        if location is None:
+            return False
+
         for path_str in [
             "autogen/lua_constants/built-in.lua",
             "autogen/lua_definitions/constants.lua",
@@ -44,8 +77,7 @@ class CoopResolver(Resolver):
             "autogen/lua_definitions/structs.lua",
         ]:
             path = Path(path_str)
-            version = dependency.versions[0]
-            dl = f"https://raw.githubusercontent.com/coop-deluxe/sm64coopdx/refs/tags/{self.version_tag_map[version]}/{path_str}"
+            dl = f"{location}/{path_str}"
             full_to = to / path
             full_to.parent.mkdir(parents=True, exist_ok=True)
             with requests.get(dl, stream=True) as res:
@@ -55,4 +87,6 @@ class CoopResolver(Resolver):
                         file.write(chunk)
                     file.flush()
 
+        build_symbol_index(to)
+
         return True
@@ -19,7 +19,10 @@ class Dependency(MetaDependency):
     needed_by: list[MetaDependency] = field(default_factory=list)
     relies_on: list[MetaDependency] = field(default_factory=list)
 
+
 class Resolver(ABC):
+    id: str
+
     @abstractmethod
     def resolve(self, name: str, version_range: str) -> Optional[Dependency]:
         pass
@@ -0,0 +1,265 @@
+import sqlite3
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from semver import Version
+
+# How long a package's versions are trusted before its provider is asked again.
+INDEX_MAX_AGE = 60 * 60
+
+_schema = """
+CREATE TABLE IF NOT EXISTS packages (
+    provider TEXT NOT NULL,
+    name TEXT NOT NULL,
+    refreshed_at REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (provider, name)
+);
+CREATE TABLE IF NOT EXISTS versions (
+    provider TEXT NOT NULL,
+    name TEXT NOT NULL,
+    version TEXT NOT NULL,
+    major INTEGER NOT NULL,
+    minor INTEGER NOT NULL,
+    patch INTEGER NOT NULL,
+    is_release INTEGER NOT NULL,
+    prerelease TEXT,
+    build TEXT,
+    location TEXT NOT NULL,
+    PRIMARY KEY (provider, name, version)
+);
+CREATE INDEX IF NOT EXISTS versions_by_order
+    ON versions (name, major, minor, patch, is_release);
+"""
+
+_operators = ("<=", ">=", "==", "!=", "<", ">")
+
+
+@dataclass
+class IndexedVersion:
+    name: str
+    provider: str
+    version: Version
+    location: str
+
+
+@dataclass
+class IndexedPackage:
+    name: str
+    provider: str
+    latest: Optional[Version]
+    count: int
+
+
+def split_version_range(version_range: str) -> tuple[str, Version]:
+    """
+    Splits a range such as '>=1.0.0' into its operator and version.
+    """
+    for op in _operators:
+        if version_range.startswith(op):
+            return op, Version.parse(version_range[len(op) :], True)
+    return "==", Version.parse(version_range, True)
+
+
+def _version_from_row(row: sqlite3.Row) -> Version:
+    return Version(
+        row["major"], row["minor"], row["patch"], row["prerelease"], row["build"]
+    )
+
+
+class PackageIndex:
+    """
+    Local database of every package version seen from any resolver.
+
+    Versions are stored pre-parsed so range queries are answered by an
+    indexed lookup instead of parsing and filtering every tag again.
+    """
+
+    path: Optional[Path] = None
+    _connection: Optional[sqlite3.Connection] = None
+
+    def open(self, path: Path):
+        self.close()
+        self.path = path
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            database = ":memory:"
+            if self.path is not None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                database = str(self.path)
+            self._connection = sqlite3.connect(database, check_same_thread=False)
+            self._connection.row_factory = sqlite3.Row
+            self._connection.executescript(_schema)
+        return self._connection
+
+    def is_stale(
+        self, provider: str, name: str, max_age: float = INDEX_MAX_AGE
+    ) -> bool:
+        row = self.connection.execute(
+            "SELECT refreshed_at FROM packages WHERE provider = ? AND name = ?",
+            (provider, name),
+        ).fetchone()
+        return row is None or time.time() - row["refreshed_at"] > max_age
+
+    def has_versions(self, provider: str, name: str) -> bool:
+        row = self.connection.execute(
+            "SELECT 1 FROM versions WHERE provider = ? AND name = ? LIMIT 1",
+            (provider, name),
+        ).fetchone()
+        return row is not None
+
+    def known_locations(self, provider: str, name: str) -> set[str]:
+        rows = self.connection.execute(
+            "SELECT location FROM versions WHERE provider = ? AND name = ?",
+            (provider, name),
+        )
+        return {row["location"] for row in rows}
+
+    def update(self, provider: str, name: str, entries: list[tuple[Version, str]]):
+        """
+        Adds new versions of a package and marks it as freshly refreshed.
+        Versions that are already indexed are left untouched.
+        """
+        with self.connection as connection:
+            connection.executemany(
+                """
+                INSERT OR IGNORE INTO versions (
+                    provider, name, version, major, minor, patch,
+                    is_release, prerelease, build, location
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                [
+                    (
+                        provider,
+                        name,
+                        str(version),
+                        version.major,
+                        version.minor,
+                        version.patch,
+                        version.prerelease is None,
+                        version.prerelease,
+                        version.build,
+                        location,
+                    )
+                    for version, location in entries
+                ],
+            )
+            connection.execute(
+                """
+                INSERT INTO packages (provider, name, refreshed_at) VALUES (?, ?, ?)
+                ON CONFLICT (provider, name) DO UPDATE SET refreshed_at = excluded.refreshed_at
+                """,
+                (provider, name, time.time()),
+            )
+
+    def query(
+        self, name: str, version_range: str = None, provider: str = None
+    ) -> list[IndexedVersion]:
+        """
+        Returns versions of a package matching the range, newest first.
+        """
+        where = ["name = ?"]
+        params: list = [name]
+        if provider is not None:
+            where.append("provider = ?")
+            params.append(provider)
+
+        op, bound = None, None
+        if version_range is not None:
+            op, bound = split_version_range(version_range)
+            # Narrow on the release triple here; prerelease ordering is settled below.
+            core = (bound.major, bound.minor, bound.patch)
+            if op in (">", ">="):
+                where.append("(major, minor, patch) >= (?, ?, ?)")
+                params.extend(core)
+            elif op in ("<", "<="):
+                where.append("(major, minor, patch) <= (?, ?, ?)")
+                params.extend(core)
+            elif op == "==":
+                where.append("(major, minor, patch) = (?, ?, ?)")
+                params.extend(core)
+
+        rows = self.connection.execute(
+            f"""
+            SELECT * FROM versions WHERE {" AND ".join(where)}
+            ORDER BY major DESC, minor DESC, patch DESC
+            """,
+            params,
+        )
+
+        versions: list[IndexedVersion] = []
+        for row in rows:
+            version = _version_from_row(row)
+            if op is not None and not _compare(version, op, bound):
+                continue
+            versions.append(
+                IndexedVersion(
+                    name=row["name"],
+                    provider=row["provider"],
+                    version=version,
+                    location=row["location"],
+                )
+            )
+        # Prerelease identifiers don't sort as text, e.g. rc.10 comes after rc.9
+        versions.sort(key=lambda indexed: indexed.version, reverse=True)
+        return versions
+
+    def location(self, provider: str, name: str, version: Version) -> Optional[str]:
+        row = self.connection.execute(
+            "SELECT location FROM versions WHERE provider = ? AND name = ? AND version = ?",
+            (provider, name, str(version)),
+        ).fetchone()
+        return None if row is None else row["location"]
+
+    def search(self, query: str = "") -> list[IndexedPackage]:
+        """
+        Lists indexed packages whose name contains the query.
+        """
+        pattern = "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        packages = self.connection.execute(
+            """
+            SELECT provider, name, COUNT(*) AS count FROM versions
+            WHERE name LIKE ? ESCAPE '\\'
+            GROUP BY provider, name ORDER BY name, provider
+            """,
+            (pattern,),
+        ).fetchall()
+
+        found: list[IndexedPackage] = []
+        for package in packages:
+            latest = self.query(package["name"], provider=package["provider"])
+            found.append(
+                IndexedPackage(
+                    name=package["name"],
+                    provider=package["provider"],
+                    latest=latest[0].version if len(latest) > 0 else None,
+                    count=package["count"],
+                )
+            )
+        return found
+
+
+def _compare(version: Version, op: str, bound: Version) -> bool:
+    result = version.compare(bound)
+    if op == ">":
+        return result > 0
+    if op == ">=":
+        return result >= 0
+    if op == "<":
+        return result < 0
+    if op == "<=":
+        return result <= 0
+    if op == "!=":
+        return result != 0
+    return result == 0
+
+
+package_index = PackageIndex()
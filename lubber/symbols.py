@@ -0,0 +1,322 @@
+import mmap
+import os
+import re
+import struct
+from bisect import bisect_left
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, Optional
+
+INDEX_FILE = "symbols.idx"
+DEFINITION_FILES = [
+    "autogen/lua_definitions/functions.lua",
+    "autogen/lua_definitions/structs.lua",
+    "autogen/lua_definitions/constants.lua",
+    "autogen/lua_definitions/manual.lua",
+]
+KINDS = ["function", "field", "constant", "global"]
+
+# Header: magic, symbol count, then offsets of the record table, the string
+# blob and the file table, and the number of files.
+_magic = b"LUBSYM\x00\x01"
+_header = struct.Struct("<8sIIIII")
+# Record: name offset and length, signature offset and length, kind, file,
+# byte offset and line of the definition. Records are sorted by folded name.
+_record = struct.Struct("<IHIHBBII")
+
+_function_regex = re.compile(r"function\s+([A-Za-z_][\w.:]*)\s*\(([^)]*)\)")
+_assign_regex = re.compile(r"([A-Za-z_]\w*)\s*=\s*(.*?)\s*$")
+_param_regex = re.compile(r"---\s*@param\s+(\S+)\s+(.+?)\s*$")
+_return_regex = re.compile(r"---\s*@return\s+(.+?)\s*$")
+_type_regex = re.compile(r"---\s*@type\s+(.+?)\s*$")
+_class_regex = re.compile(r"---\s*@class\s+([\w.]+)")
+_field_regex = re.compile(
+    r"---\s*@field\s+(?:(?:public|private|protected)\s+)?(\w+)\s+(.+?)\s*$"
+)
+
+
+@dataclass
+class Symbol:
+    name: str
+    kind: str
+    signature: str
+    file: str
+    offset: int
+    line: int
+
+
+def _lines(text: bytes) -> Iterator[tuple[int, int, str]]:
+    offset = 0
+    for number, line in enumerate(text.splitlines(keepends=True), start=1):
+        yield offset, number, line.decode(errors="replace").rstrip("\r\n")
+        offset += len(line)
+
+
+def parse_definitions(text: bytes, file: int) -> list[tuple]:
+    """
+    Finds the functions, struct fields and constants in one definitions file.
+    """
+    symbols: list[tuple] = []
+    params: dict[str, str] = {}
+    returns: list[str] = []
+    type_name: Optional[str] = None
+    struct_name: Optional[str] = None
+
+    for offset, number, line in _lines(text):
+        if line.startswith("---"):
+            if match := _param_regex.match(line):
+                params[match.group(1)] = match.group(2)
+            elif match := _return_regex.match(line):
+                returns.append(match.group(1))
+            elif match := _type_regex.match(line):
+                type_name = match.group(1)
+            elif match := _class_regex.match(line):
+                struct_name = match.group(1)
+            elif (match := _field_regex.match(line)) and struct_name is not None:
+                name = f"{struct_name}.{match.group(1)}"
+                symbols.append(
+                    (name, "field", f"{name}: {match.group(2)}", file, offset, number)
+                )
+            continue
+
+        if match := _function_regex.match(line):
+            name = match.group(1)
+            args = []
+            for arg in match.group(2).split(","):
+                arg = arg.strip()
+                if arg == "":
+                    continue
+                args.append(f"{arg}: {params[arg]}" if arg in params else arg)
+            signature = f"{name}({', '.join(args)})"
+            if len(returns) > 0:
+                signature += ": " + ", ".join(returns)
+            symbols.append((name, "function", signature, file, offset, number))
+        elif (match := _assign_regex.match(line)) and type_name is not None:
+            name = match.group(1)
+            value = match.group(2)
+            kind = "constant" if name.isupper() else "global"
+            signature = f"{name}: {type_name}"
+            if kind == "constant" and value != "":
+                signature += f" = {value}"
+            symbols.append((name, kind, signature, file, offset, number))
+
+        if line.strip() == "" or not line.startswith(" "):
+            params = {}
+            returns = []
+            type_name = None
+        if line.strip() == "":
+            struct_name = None
+
+    return symbols
+
+
+def build_symbol_index(lib_dir: Path) -> Path:
+    """
+    Indexes the definitions of an installed sm64coopdx version into a single
+    file that queries can memory-map.
+    """
+    files: list[str] = []
+    symbols: list[tuple] = []
+    for path_str in DEFINITION_FILES:
+        path = lib_dir / path_str
+        if not path.is_file():
+            continue
+        symbols.extend(parse_definitions(path.read_bytes(), len(files)))
+        files.append(path_str)
+
+    symbols.sort(key=lambda symbol: (symbol[0].lower(), symbol[0]))
+
+    strings = bytearray()
+    records = bytearray()
+    for name, kind, signature, file, offset, line in symbols:
+        name_bytes = name.encode()
+        signature_bytes = signature.encode()[:0xFFFF]
+        records += _record.pack(
+            len(strings),
+            len(name_bytes),
+            len(strings) + len(name_bytes),
+            len(signature_bytes),
+            KINDS.index(kind),
+            file,
+            offset,
+            line,
+        )
+        strings += name_bytes + signature_bytes
+
+    file_table = bytearray()
+    for file in files:
+        file_bytes = file.encode()
+        file_table += struct.pack("<H", len(file_bytes)) + file_bytes
+
+    records_offset = _header.size
+    strings_offset = records_offset + len(records)
+    files_offset = strings_offset + len(strings)
+
+    index_file = lib_dir / INDEX_FILE
+    temp_file = index_file.with_suffix(".tmp")
+    with open(temp_file, "wb") as file:
+        file.write(
+            _header.pack(
+                _magic,
+                len(symbols),
+                records_offset,
+                strings_offset,
+                files_offset,
+                len(files),
+            )
+        )
+        file.write(records)
+        file.write(strings)
+        file.write(file_table)
+    # Swap the file in whole so running queries never see half of it
+    os.replace(temp_file, index_file)
+    return index_file
+
+
+class SymbolIndex:
+    """
+    Read-only view of a symbols.idx file. The file is memory-mapped, so
+    opening it is cheap and its pages are shared between processes.
+    """
+
+    def __init__(self, path: Path):
+        with open(path, "rb") as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        (
+            magic,
+            self._count,
+            self._records_offset,
+            self._strings_offset,
+            files_offset,
+            file_count,
+        ) = _header.unpack_from(self._map, 0)
+        if magic != _magic:
+            self.close()
+            raise Exception(f"'{path}' is not a symbol index.")
+
+        self.files: list[str] = []
+        pos = files_offset
+        for _ in range(file_count):
+            (length,) = struct.unpack_from("<H", self._map, pos)
+            self.files.append(self._map[pos + 2 : pos + 2 + length].decode())
+            pos += 2 + length
+
+    def __enter__(self) -> "SymbolIndex":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def close(self):
+        self._map.close()
+
+    def _name(self, index: int) -> str:
+        name_offset, name_length = struct.unpack_from(
+            "<IH", self._map, self._records_offset + index * _record.size
+        )
+        start = self._strings_offset + name_offset
+        return self._map[start : start + name_length].decode()
+
+    def symbol(self, index: int) -> Symbol:
+        name_offset, name_length, sig_offset, sig_length, kind, file, offset, line = (
+            _record.unpack_from(self._map, self._records_offset + index * _record.size)
+        )
+        start = self._strings_offset
+        return Symbol(
+            name=self._map[
+                start + name_offset : start + name_offset + name_length
+            ].decode(),
+            kind=KINDS[kind],
+            signature=self._map[
+                start + sig_offset : start + sig_offset + sig_length
+            ].decode(),
+            file=self.files[file],
+            offset=offset,
+            line=line,
+        )
+
+    def prefix(self, prefix: str, limit: int = None) -> list[Symbol]:
+        """
+        Finds symbols starting with the prefix, ignoring case.
+        """
+        folded = prefix.lower()
+        names = _FoldedNames(self)
+        index = bisect_left(names, folded)
+        found: list[Symbol] = []
+        while index < self._count and (limit is None or len(found) < limit):
+            if not names[index].startswith(folded):
+                break
+            found.append(self.symbol(index))
+            index += 1
+        return found
+
+    def fuzzy(self, query: str, limit: int = None) -> list[Symbol]:
+        """
+        Finds symbols containing the query's characters in order, best
+        matches first.
+        """
+        folded = query.lower()
+        scored: list[tuple[int, int, int]] = []
+        for index in range(self._count):
+            name = self._name(index)
+            score = fuzzy_score(folded, name.lower())
+            if score is not None:
+                scored.append((-score, len(name), index))
+        scored.sort()
+        if limit is not None:
+            scored = scored[:limit]
+        return [self.symbol(index) for _, _, index in scored]
+
+
+class _FoldedNames:
+    """Sequence of lowercased names so bisect can search the index directly."""
+
+    def __init__(self, index: SymbolIndex):
+        self.index = index
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __getitem__(self, position: int) -> str:
+        return self.index._name(position).lower()
+
+
+def fuzzy_score(query: str, name: str) -> Optional[int]:
+    """
+    Scores how well a lowercase query matches a lowercase name, or None if
+    its characters don't all appear in order. Runs of consecutive matches and
+    matches at the start of a word count for more.
+    """
+    score = 0
+    pos = 0
+    run = 0
+    for char in query:
+        found = name.find(char, pos)
+        if found == -1:
+            return None
+        if found == pos and pos > 0:
+            run += 1
+            score += 2 * run
+        else:
+            run = 0
+        if found == 0 or name[found - 1] in "_.:":
+            score += 3
+        score -= found - pos
+        pos = found + 1
+    if query == name:
+        score += 100
+    return score
+
+
+def open_symbol_index(lib_dir: Path) -> SymbolIndex:
+    """
+    Opens the symbol index for an installed version, building it first if
+    the version was installed before indexes existed.
+    """
+    index_file = lib_dir / INDEX_FILE
+    if not index_file.is_file():
+        build_symbol_index(lib_dir)
+    return SymbolIndex(index_file)
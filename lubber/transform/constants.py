@@ -0,0 +1,427 @@
+import json
+import math
+import re
+from pathlib import Path
+from typing import Optional, Union
+
+from lubber.transform.lexer import Token, apply_edits, tokenize
+from lubber.transform.scope import scan
+
+ConstantValue = Union[bool, int, float, str]
+
+CONSTANT_FILES = [
+    "autogen/lua_constants/built-in.lua",
+    "autogen/lua_definitions/constants.lua",
+]
+CACHE_FILE = "constants.json"
+CACHE_FORMAT = 2
+
+_constant_name_regex = re.compile(r"[A-Z][A-Z0-9_]*")
+
+# Binary operator priorities from lparser.c as (left, right)
+_binary_priority = {
+    "+": (10, 10),
+    "-": (10, 10),
+    "*": (11, 11),
+    "%": (11, 11),
+    "^": (14, 13),
+    "/": (11, 11),
+    "//": (11, 11),
+    "&": (6, 6),
+    "|": (4, 4),
+    "~": (5, 5),
+    "<<": (7, 7),
+    ">>": (7, 7),
+    "..": (9, 8),
+    "==": (3, 3),
+    "<": (3, 3),
+    "<=": (3, 3),
+    "~=": (3, 3),
+    ">": (3, 3),
+    ">=": (3, 3),
+    "and": (2, 2),
+    "or": (1, 1),
+}
+_unary_priority = 12
+
+# Tokens after a name that make it more than a plain value
+_suffix_symbols = ("(", "{", "[", ".", ":")
+
+
+class _Unsupported(Exception):
+    pass
+
+
+def _wrap(value: int) -> int:
+    value &= 0xFFFFFFFFFFFFFFFF
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def _type_name(value: ConstantValue) -> str:
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, str):
+        return "string"
+    return "number"
+
+
+def _to_integer(value: ConstantValue) -> int:
+    if isinstance(value, bool):
+        raise _Unsupported()
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return _wrap(int(value))
+    raise _Unsupported()
+
+
+def _to_number(value: ConstantValue) -> Union[int, float]:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise _Unsupported()
+    return value
+
+
+def _to_string(value: ConstantValue) -> str:
+    if isinstance(value, str):
+        return value
+    if isinstance(value, bool):
+        raise _Unsupported()
+    if isinstance(value, int):
+        return str(value)
+    text = "%.14g" % value
+    if re.fullmatch(r"-?[0-9]+", text):
+        text += ".0"
+    return text
+
+
+def _shift_left(value: int, shift: int) -> int:
+    if shift < 0:
+        return _shift_right(value, -shift)
+    if shift >= 64:
+        return 0
+    return _wrap(value << shift)
+
+
+def _shift_right(value: int, shift: int) -> int:
+    if shift < 0:
+        return _shift_left(value, -shift)
+    if shift >= 64:
+        return 0
+    return _wrap((value & 0xFFFFFFFFFFFFFFFF) >> shift)
+
+
+def _arith(op: str, a: ConstantValue, b: ConstantValue) -> ConstantValue:
+    if op in ("&", "|", "~", "<<", ">>"):
+        a, b = _to_integer(a), _to_integer(b)
+        if op == "&":
+            return _wrap(a & b)
+        if op == "|":
+            return _wrap(a | b)
+        if op == "~":
+            return _wrap(a ^ b)
+        if op == "<<":
+            return _shift_left(a, b)
+        return _shift_right(a, b)
+
+    if op == "..":
+        return _to_string(a) + _to_string(b)
+
+    if op in ("==", "~="):
+        equal = a == b and _type_name(a) == _type_name(b)
+        return equal if op == "==" else not equal
+    if op in ("<", "<=", ">", ">="):
+        if _type_name(a) != _type_name(b) or isinstance(a, bool):
+            raise _Unsupported()
+        if op == "<":
+            return a < b
+        if op == "<=":
+            return a <= b
+        if op == ">":
+            return a > b
+        return a >= b
+
+    a, b = _to_number(a), _to_number(b)
+    both_integers = isinstance(a, int) and isinstance(b, int)
+    if op == "+":
+        return _wrap(a + b) if both_integers else float(a) + float(b)
+    if op == "-":
+        return _wrap(a - b) if both_integers else float(a) - float(b)
+    if op == "*":
+        return _wrap(a * b) if both_integers else float(a) * float(b)
+    if op == "/":
+        return float(a) / float(b)
+    if op == "^":
+        return math.pow(float(a), float(b))
+    if op == "//":
+        if both_integers:
+            return _wrap(a // b)
+        return float(math.floor(float(a) / float(b)))
+    if op == "%":
+        if both_integers:
+            return _wrap(a % b)
+        remainder = math.fmod(float(a), float(b))
+        if remainder * float(b) < 0:
+            remainder += float(b)
+        return remainder
+    raise _Unsupported()
+
+
+def _number(text: str) -> Union[int, float]:
+    lower = text.lower()
+    if lower.startswith("0x"):
+        if "." in lower or "p" in lower:
+            return float.fromhex(lower)
+        return _wrap(int(lower, 16))
+    if "." in lower or "e" in lower:
+        return float(lower)
+    value = int(lower)
+    return value if value < (1 << 63) else float(value)
+
+
+def _string(text: str) -> str:
+    if text.startswith("["):
+        body = text[text.index("[", 1) + 1 : text.rindex("]", 0, -1)]
+        return body[1:] if body.startswith("\n") else body
+    if "\\" in text:
+        # Escapes beyond the simple ones aren't worth evaluating here
+        raise _Unsupported()
+    return text[1:-1]
+
+
+class _Evaluator:
+    def __init__(self, tokens: list[Token], env: dict[str, ConstantValue]):
+        self.tokens = tokens
+        self.env = env
+        self.pos = 0
+
+    def peek(self) -> Optional[Token]:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def next(self) -> Token:
+        token = self.peek()
+        if token is None:
+            raise _Unsupported()
+        self.pos += 1
+        return token
+
+    def simple(self) -> ConstantValue:
+        token = self.next()
+        if token.kind == "number":
+            return _number(token.text)
+        if token.kind == "string":
+            return _string(token.text)
+        if token.is_keyword("true", "false"):
+            return token.text == "true"
+        if token.kind == "name":
+            if token.text not in self.env:
+                raise _Unsupported()
+            return self.env[token.text]
+        if token.is_symbol("("):
+            value = self.expression()
+            if not self.next().is_symbol(")"):
+                raise _Unsupported()
+            return value
+        raise _Unsupported()
+
+    def expression(self, limit: int = 0) -> ConstantValue:
+        token = self.peek()
+        if token is not None and (
+            token.is_symbol("-", "~", "#") or token.is_keyword("not")
+        ):
+            self.next()
+            operand = self.expression(_unary_priority)
+            if token.text == "-":
+                operand = _to_number(operand)
+                value = _wrap(-operand) if isinstance(operand, int) else -operand
+            elif token.text == "~":
+                value = _wrap(~_to_integer(operand))
+            elif token.text == "#":
+                if not isinstance(operand, str):
+                    raise _Unsupported()
+                value = len(operand.encode())
+            else:
+                value = operand is False
+        else:
+            value = self.simple()
+
+        while True:
+            token = self.peek()
+            if token is None or token.kind not in ("symbol", "keyword"):
+                break
+            priority = _binary_priority.get(token.text)
+            if priority is None or priority[0] <= limit:
+                break
+            self.next()
+            right = self.expression(priority[1])
+            if token.text == "and":
+                value = right if value is not False else value
+            elif token.text == "or":
+                value = value if value is not False else right
+            else:
+                value = _arith(token.text, value, right)
+        return value
+
+
+def parse_constants(
+    sources: list[str], constants: dict[str, ConstantValue] = None
+) -> dict[str, ConstantValue]:
+    """
+    Evaluates the plain top level constant assignments in each source, in
+    order. Names assigned anywhere else, or more than once, are left out
+    since they can't be trusted to stay the same at runtime.
+    """
+    if constants is None:
+        constants = {}
+    definitions: dict[str, int] = {}
+    mutable: set[str] = set()
+
+    for source in sources:
+        tokens = tokenize(source)
+        top_level: dict[str, int] = {}
+        depth = 0
+        for i, token in enumerate(tokens):
+            if token.is_keyword("function", "do", "if", "repeat") or token.is_symbol(
+                "(", "[", "{"
+            ):
+                depth += 1
+                continue
+            if token.is_keyword("end", "until") or token.is_symbol(")", "]", "}"):
+                depth -= 1
+                continue
+            if depth != 0 or token.kind != "name":
+                continue
+            if i > 0 and (
+                tokens[i - 1].is_symbol(".", ":", ",")
+                or tokens[i - 1].is_keyword("local")
+            ):
+                continue
+            if i + 1 >= len(tokens) or not tokens[i + 1].is_symbol("="):
+                continue
+
+            name = token.text
+            top_level[name] = top_level.get(name, 0) + 1
+            definitions[name] = definitions.get(name, 0) + 1
+
+            evaluator = _Evaluator(tokens[i + 2 :], constants)
+            try:
+                value = evaluator.expression()
+                after = evaluator.peek()
+                if after is not None and (
+                    after.kind in ("string", "number")
+                    or after.is_symbol(",", *_suffix_symbols)
+                ):
+                    raise _Unsupported()
+            except (_Unsupported, ArithmeticError, ValueError):
+                mutable.add(name)
+                continue
+
+            if isinstance(value, float) and not math.isfinite(value):
+                mutable.add(name)
+                continue
+            constants[name] = value
+
+        # Any assignment besides the plain top level ones, e.g. in a function
+        for name, count in scan(tokens).assignments.items():
+            if count > top_level.get(name, 0):
+                mutable.add(name)
+
+    for name, count in definitions.items():
+        if count > 1:
+            mutable.add(name)
+
+    return {
+        name: value
+        for name, value in constants.items()
+        if name not in mutable and _constant_name_regex.fullmatch(name)
+    }
+
+
+def load_constants(lib_dir: Path) -> dict[str, ConstantValue]:
+    """
+    Loads the constant symbol table for an installed sm64coopdx version,
+    parsing its constant files on first use and caching the result.
+    """
+    cache_file = lib_dir / CACHE_FILE
+    if cache_file.is_file():
+        try:
+            cache = json.loads(cache_file.read_text())
+            if cache.get("format") == CACHE_FORMAT:
+                return cache["constants"]
+        except (json.JSONDecodeError, KeyError):
+            pass
+
+    sources = []
+    for path_str in CONSTANT_FILES:
+        path = lib_dir / path_str
+        if path.is_file():
+            sources.append(path.read_text(errors="replace"))
+    constants = parse_constants(sources)
+
+    cache_file.write_text(json.dumps({"format": CACHE_FORMAT, "constants": constants}))
+    return constants
+
+
+def lua_literal(value: ConstantValue) -> Optional[str]:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, int):
+        if value == -(1 << 63):
+            return "(-9223372036854775807 - 1)"
+        return f"({value})" if value < 0 else str(value)
+    if isinstance(value, float):
+        if not math.isfinite(value):
+            return None
+        text = repr(value)
+        return f"({text})" if value < 0 or text.startswith("-") else text
+    if isinstance(value, str):
+        escaped = ""
+        for char in value:
+            if char in "\\\"":
+                escaped += "\\" + char
+            elif char == "\n":
+                escaped += "\\n"
+            elif ord(char) < 32 or ord(char) == 127:
+                escaped += f"\\{ord(char):03d}"
+            else:
+                escaped += char
+        return f'"{escaped}"'
+    return None
+
+
+def inline_constants(
+    source: str, constants: dict[str, ConstantValue], assigned: set[str]
+) -> tuple[str, int]:
+    """
+    Replaces reads of known constants with their literal values. Names the
+    chunk shadows, or that any part of the project assigns to, are skipped.
+    Returns the new source and the number of lookups removed.
+    """
+    tokens = tokenize(source)
+    result = scan(tokens)
+
+    edits: list[tuple[int, int, str]] = []
+    for i in result.reads:
+        token = tokens[i]
+        name = token.text
+        if name not in constants or name in result.locals or name in assigned:
+            continue
+        after = tokens[i + 1] if i + 1 < len(tokens) else None
+        if after is not None and (
+            after.kind == "string" or after.is_symbol(*_suffix_symbols)
+        ):
+            continue
+        value = constants[name]
+        literal = lua_literal(value)
+        if literal is None:
+            continue
+        if (
+            after is not None
+            and after.is_symbol("..")
+            and isinstance(value, (int, float))
+            and not literal.startswith("(")
+        ):
+            # '1..x' would read as a malformed number
+            literal = f"({literal})"
+        edits.append((token.start, token.end, literal))
+
+    return apply_edits(source, edits), len(edits)
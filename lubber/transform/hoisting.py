@@ -0,0 +1,135 @@
+import re
+from dataclasses import dataclass
+from pathlib import Path
+
+from lubber.transform.lexer import apply_edits, tokenize
+from lubber.transform.scope import scan
+
+FUNCTIONS_FILE = "autogen/lua_definitions/functions.lua"
+
+# Lua allows 200 active locals per function. Hoisted names are kept well
+# under that, leaving room for locals the scan can't see.
+LUA_MAX_LOCALS = 200
+LOCAL_HEADROOM = 20
+MAX_HOISTED = 100
+MIN_USES = 2
+
+# Standard library globals and tables that mods can't usefully replace
+STANDARD_FUNCTIONS = {
+    "assert",
+    "error",
+    "getmetatable",
+    "ipairs",
+    "next",
+    "pairs",
+    "pcall",
+    "print",
+    "rawequal",
+    "rawget",
+    "rawlen",
+    "rawset",
+    "select",
+    "setmetatable",
+    "tonumber",
+    "tostring",
+    "type",
+    "xpcall",
+}
+STANDARD_LIBRARIES = {"math", "string", "table", "utf8"}
+
+_function_regex = re.compile(r"^function\s+([A-Za-z_][A-Za-z0-9_]*)\s*\(", re.M)
+
+
+@dataclass
+class _Hoist:
+    local: str
+    value: str
+    uses: list[tuple[int, int]]
+
+
+def load_functions(lib_dir: Path) -> set[str]:
+    """
+    Lists the global API functions of an installed sm64coopdx version.
+    """
+    path = lib_dir / FUNCTIONS_FILE
+    if not path.is_file():
+        return set()
+    return set(_function_regex.findall(path.read_text(errors="replace")))
+
+
+def hoist_globals(
+    source: str, functions: set[str], assigned: set[str], assigned_fields: set[str]
+) -> tuple[str, int, int]:
+    """
+    Caches frequently read globals in locals declared at the top of the
+    chunk, so hot callbacks read an upvalue instead of the global table.
+
+    Only API functions, standard functions and standard library fields are
+    considered, and only when nothing in the project assigns to them and the
+    chunk never declares a local of the same name. The declaration shares
+    the first line so line numbers in errors don't move.
+
+    Returns the new source, the number of names hoisted and the number of
+    lookups they replace.
+    """
+    tokens = tokenize(source)
+    result = scan(tokens)
+    names = {token.text for token in tokens if token.kind == "name"}
+
+    candidates: dict[str, _Hoist] = {}
+    blocked: set[str] = set()
+    for i in result.reads:
+        token = tokens[i]
+        name = token.text
+        if name in result.locals or name in assigned:
+            continue
+
+        if name in STANDARD_LIBRARIES:
+            if i + 2 >= len(tokens) or not tokens[i + 1].is_symbol("."):
+                continue
+            field = tokens[i + 2]
+            if field.kind != "name":
+                continue
+            key = f"{name}.{field.text}"
+            local = f"{name}_{field.text}"
+            if key in assigned_fields or local in names:
+                # Written to somewhere, or the local name is taken
+                blocked.add(key)
+                continue
+            hoist = candidates.setdefault(key, _Hoist(local, key, []))
+            hoist.uses.append((token.start, field.end))
+            continue
+
+        if name in functions or name in STANDARD_FUNCTIONS:
+            hoist = candidates.setdefault(name, _Hoist(name, name, []))
+            hoist.uses.append((token.start, token.end))
+
+    budget = min(MAX_HOISTED, LUA_MAX_LOCALS - LOCAL_HEADROOM - result.main_locals)
+    hoisted = sorted(
+        (
+            hoist
+            for key, hoist in candidates.items()
+            if key not in blocked and len(hoist.uses) >= MIN_USES
+        ),
+        key=lambda hoist: (-len(hoist.uses), hoist.local),
+    )[: max(budget, 0)]
+    if len(hoisted) == 0:
+        return source, 0, 0
+
+    edits: list[tuple[int, int, str]] = []
+    lookups = 0
+    for hoist in hoisted:
+        lookups += len(hoist.uses)
+        if hoist.local == hoist.value:
+            continue
+        for start, end in hoist.uses:
+            edits.append((start, end, hoist.local))
+
+    declaration = (
+        "local "
+        + ", ".join(hoist.local for hoist in hoisted)
+        + " = "
+        + ", ".join(hoist.value for hoist in hoisted)
+        + "; "
+    )
+    return declaration + apply_edits(source, edits), len(hoisted), lookups
@@ -0,0 +1,180 @@
+import re
+from dataclasses import dataclass
+
+KEYWORDS = {
+    "and",
+    "break",
+    "do",
+    "else",
+    "elseif",
+    "end",
+    "false",
+    "for",
+    "function",
+    "goto",
+    "if",
+    "in",
+    "local",
+    "nil",
+    "not",
+    "or",
+    "repeat",
+    "return",
+    "then",
+    "true",
+    "until",
+    "while",
+}
+
+# Longest symbols first so '...' wins over '..' and '.'.
+SYMBOLS = [
+    "...",
+    "..",
+    "==",
+    "~=",
+    "<=",
+    ">=",
+    "<<",
+    ">>",
+    "//",
+    "::",
+    *"+-*/%^#&~|<>=(){}[];:,.",
+]
+
+_name_regex = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+_number_regex = re.compile(
+    r"0[xX](?:[0-9a-fA-F]*\.?[0-9a-fA-F]*)(?:[pP][+-]?[0-9]+)?"
+    r"|(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][+-]?[0-9]+)?"
+)
+_long_bracket_regex = re.compile(r"\[(=*)\[")
+
+
+class LuaSyntaxError(Exception):
+    pass
+
+
+@dataclass
+class Token:
+    kind: str
+    """One of 'name', 'keyword', 'number', 'string' or 'symbol'."""
+    text: str
+    start: int
+    end: int
+    line: int
+
+    def is_symbol(self, *symbols: str) -> bool:
+        return self.kind == "symbol" and self.text in symbols
+
+    def is_keyword(self, *keywords: str) -> bool:
+        return self.kind == "keyword" and self.text in keywords
+
+
+def _long_bracket_end(source: str, pos: int, name: str, line: int) -> int:
+    match = _long_bracket_regex.match(source, pos)
+    close = "]" + match.group(1) + "]"
+    end = source.find(close, match.end())
+    if end == -1:
+        raise LuaSyntaxError(f"Unfinished long {name} starting on line {line}.")
+    return end + len(close)
+
+
+def _string_end(source: str, pos: int, line: int) -> int:
+    quote = source[pos]
+    pos += 1
+    while pos < len(source):
+        char = source[pos]
+        if char == "\\":
+            pos += 2
+            continue
+        if char == quote:
+            return pos + 1
+        if char == "\n":
+            break
+        pos += 1
+    raise LuaSyntaxError(f"Unfinished string on line {line}.")
+
+
+def tokenize(source: str) -> list[Token]:
+    """
+    Splits Lua source into tokens. Whitespace and comments are dropped, but
+    every token keeps its offsets so edits can be made to the original text.
+    """
+    tokens: list[Token] = []
+    pos = 0
+    line = 1
+    length = len(source)
+
+    while pos < length:
+        char = source[pos]
+
+        if char in " \t\r\f\v":
+            pos += 1
+            continue
+        if char == "\n":
+            line += 1
+            pos += 1
+            continue
+
+        if source.startswith("--", pos):
+            if _long_bracket_regex.match(source, pos + 2):
+                end = _long_bracket_end(source, pos + 2, "comment", line)
+            else:
+                end = source.find("\n", pos)
+                if end == -1:
+                    end = length
+            line += source.count("\n", pos, end)
+            pos = end
+            continue
+
+        if pos == 0 and char == "#":
+            # Skip a shebang line
+            end = source.find("\n")
+            pos = length if end == -1 else end
+            continue
+
+        start = pos
+        if char == "_" or char.isalpha():
+            match = _name_regex.match(source, pos)
+            text = match.group(0)
+            kind = "keyword" if text in KEYWORDS else "name"
+            end = match.end()
+        elif char.isdigit() or (
+            char == "." and pos + 1 < length and source[pos + 1].isdigit()
+        ):
+            match = _number_regex.match(source, pos)
+            kind = "number"
+            end = match.end()
+        elif char in "\"'":
+            kind = "string"
+            end = _string_end(source, pos, line)
+        elif char == "[" and _long_bracket_regex.match(source, pos):
+            kind = "string"
+            end = _long_bracket_end(source, pos, "string", line)
+        else:
+            for symbol in SYMBOLS:
+                if source.startswith(symbol, pos):
+                    break
+            else:
+                raise LuaSyntaxError(f"Unexpected character '{char}' on line {line}.")
+            kind = "symbol"
+            end = pos + len(symbol)
+
+        tokens.append(Token(kind, source[start:end], start, end, line))
+        line += source.count("\n", start, end)
+        pos = end
+
+    return tokens
+
+
+def apply_edits(source: str, edits: list[tuple[int, int, str]]) -> str:
+    """
+    Replaces each (start, end) span of the source with new text.
+    """
+    output: list[str] = []
+    pos = 0
+    for start, end, text in sorted(edits, key=lambda edit: edit[0]):
+        output.append(source[pos:start])
+        output.append(text)
+        pos = end
+    output.append(source[pos:])
+    return "".join(output)
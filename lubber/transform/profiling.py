@@ -0,0 +1,102 @@
+import importlib.resources as resources
+from dataclasses import dataclass
+from pathlib import Path
+
+from lubber.transform.constants import lua_literal
+from lubber.transform.lexer import apply_edits, tokenize
+from lubber.transform.scope import scan
+
+PROFILE_GLOBAL = "__lubber_profile"
+PROFILE_LOG = "lubber-profile.log"
+SAMPLE_PREFIX = "lubber-profile\t"
+HOOK_FUNCTIONS = {"hook_event", "hook_mario_action"}
+
+
+@dataclass
+class HookProfile:
+    label: str
+    calls: int = 0
+    total: float = 0
+    max: float = 0
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.calls if self.calls > 0 else 0
+
+
+def _runtime() -> str:
+    # Squashed onto one line so it doesn't move the chunk's line numbers
+    source = resources.files("lubber").joinpath("data/profile.lua").read_text()
+    return " ".join(token.text for token in tokenize(source)) + " "
+
+
+def instrument_hooks(
+    source: str, chunk_name: str, assigned: set[str]
+) -> tuple[str, int]:
+    """
+    Sends hook_event and hook_mario_action registrations through the
+    profiling runtime, labelled with where they were made, so every
+    callback is timed. Returns the new source and the number of hooks.
+    """
+    tokens = tokenize(source)
+    result = scan(tokens)
+
+    edits: list[tuple[int, int, str]] = []
+    for i in result.reads:
+        token = tokens[i]
+        if (
+            token.text not in HOOK_FUNCTIONS
+            or token.text in result.locals
+            or token.text in assigned
+        ):
+            continue
+        if i + 2 >= len(tokens) or not tokens[i + 1].is_symbol("("):
+            continue
+        if tokens[i + 2].is_symbol(")"):
+            continue
+
+        label = f"{chunk_name}:{token.line}"
+        # Name the hook or action when it's passed as a plain constant
+        if (
+            i + 3 < len(tokens)
+            and tokens[i + 2].kind == "name"
+            and tokens[i + 3].is_symbol(",")
+        ):
+            label += " " + tokens[i + 2].text
+        edits.append(
+            (
+                token.start,
+                tokens[i + 1].end,
+                f"{PROFILE_GLOBAL}.{token.text}({lua_literal(label)}, ",
+            )
+        )
+
+    if len(edits) == 0:
+        return source, 0
+    return _runtime() + apply_edits(source, edits), len(edits)
+
+
+def read_profile_log(path: Path) -> list[HookProfile]:
+    """
+    Adds up the samples in a profile log, hottest hooks first. Lines that
+    aren't samples are skipped, so the game's own log can be read directly.
+    """
+    hooks: dict[str, HookProfile] = {}
+    for line in path.read_text(errors="replace").splitlines():
+        start = line.find(SAMPLE_PREFIX)
+        if start == -1:
+            continue
+        fields = line[start + len(SAMPLE_PREFIX) :].split("\t")
+        if len(fields) != 4:
+            continue
+        label, calls, total, max_time = fields
+        try:
+            calls, total, max_time = int(calls), float(total), float(max_time)
+        except ValueError:
+            continue
+        hook = hooks.setdefault(label, HookProfile(label))
+        hook.calls += calls
+        hook.total += total
+        hook.max = max(hook.max, max_time)
+
+    return sorted(hooks.values(), key=lambda hook: hook.total, reverse=True)
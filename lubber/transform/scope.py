@@ -0,0 +1,217 @@
+from dataclasses import dataclass, field
+
+from lubber.transform.lexer import Token
+
+_openers = {"(": ")", "[": "]", "{": "}"}
+_closers = {")": "(", "]": "[", "}": "{"}
+_block_openers = {"function", "do", "if", "repeat"}
+_block_closers = {"end", "until"}
+
+
+@dataclass
+class Scan:
+    """
+    What a chunk does with its names, worked out without a full parser.
+
+    The scan is deliberately conservative: a name declared local anywhere in
+    the chunk counts as shadowed everywhere in it.
+    """
+
+    reads: list[int] = field(default_factory=list)
+    """Indices of name tokens that read a variable, local or global."""
+    locals: set[str] = field(default_factory=set)
+    """Names declared as locals, parameters or loop variables."""
+    assigned: set[str] = field(default_factory=set)
+    """Global names that are assigned to."""
+    assignments: dict[str, int] = field(default_factory=dict)
+    """How many times each global name is assigned to, counting function
+    statements."""
+    assigned_fields: set[str] = field(default_factory=set)
+    """Table fields assigned by name, as 'table.field'."""
+    main_locals: int = 0
+    """Locals the main chunk declares outside any function, counting the
+    hidden state of numeric and generic for loops."""
+
+
+def _match_open(tokens: list[Token], index: int) -> int:
+    depth = 0
+    closer = tokens[index].text
+    opener = _closers[closer]
+    for j in range(index, -1, -1):
+        token = tokens[j]
+        if token.is_symbol(closer):
+            depth += 1
+        elif token.is_symbol(opener):
+            depth -= 1
+            if depth == 0:
+                return j
+    return 0
+
+
+def _target_start(tokens: list[Token], index: int) -> tuple[int, bool]:
+    """
+    Walks back over one assignment target ending at index. Returns where it
+    starts and whether it is a bare name.
+    """
+    bare = True
+    j = index
+    while j >= 0:
+        token = tokens[j]
+        if token.kind == "symbol" and token.text in _closers:
+            j = _match_open(tokens, j) - 1
+            bare = False
+            continue
+        if token.kind == "name":
+            if j > 0 and tokens[j - 1].is_symbol(".", ":"):
+                j -= 2
+                bare = False
+                continue
+            return j, bare
+        return j, False
+    return 0, False
+
+
+def scan(tokens: list[Token]) -> Scan:
+    result = Scan()
+    stack: list[str] = []
+    declared: set[int] = set()
+    not_reads: set[int] = set()
+
+    def assign(index: int):
+        name = tokens[index].text
+        result.assigned.add(name)
+        result.assignments[name] = result.assignments.get(name, 0) + 1
+
+    def declare(index: int):
+        declared.add(index)
+        result.locals.add(tokens[index].text)
+        if "function" not in stack:
+            result.main_locals += 1
+
+    for i, token in enumerate(tokens):
+        prev = tokens[i - 1] if i > 0 else None
+        after = tokens[i + 1] if i + 1 < len(tokens) else None
+
+        if token.kind == "keyword":
+            if token.text in _block_openers:
+                stack.append(token.text)
+            elif token.text in _block_closers and len(stack) > 0:
+                stack.pop()
+
+            if token.is_keyword("local") and after is not None:
+                if after.is_keyword("function"):
+                    if i + 2 < len(tokens):
+                        declare(i + 2)
+                    continue
+                j = i + 1
+                while j < len(tokens) and tokens[j].kind == "name":
+                    declare(j)
+                    j += 1
+                    # Lua 5.4 attributes, e.g. <const>
+                    if j + 2 < len(tokens) and tokens[j].is_symbol("<"):
+                        j += 3
+                    if j < len(tokens) and tokens[j].is_symbol(","):
+                        j += 1
+                    else:
+                        break
+
+            elif token.is_keyword("function"):
+                j = i + 1
+                method = False
+                if j < len(tokens) and tokens[j].kind == "name":
+                    is_local = prev is not None and prev.is_keyword("local")
+                    if (
+                        not is_local
+                        and j + 1 < len(tokens)
+                        and tokens[j + 1].is_symbol("(")
+                    ):
+                        assign(j)
+                    not_reads.add(j)
+                    if (
+                        not is_local
+                        and j + 3 < len(tokens)
+                        and tokens[j + 1].is_symbol(".", ":")
+                        and tokens[j + 2].kind == "name"
+                        and tokens[j + 3].is_symbol("(")
+                    ):
+                        result.assigned_fields.add(
+                            f"{tokens[j].text}.{tokens[j + 2].text}"
+                        )
+                    j += 1
+                    while j + 1 < len(tokens) and tokens[j].is_symbol(".", ":"):
+                        method = method or tokens[j].text == ":"
+                        j += 2
+                if method:
+                    result.locals.add("self")
+                if j < len(tokens) and tokens[j].is_symbol("("):
+                    j += 1
+                    while j < len(tokens) and not tokens[j].is_symbol(")"):
+                        if tokens[j].kind == "name":
+                            declared.add(j)
+                            result.locals.add(tokens[j].text)
+                        j += 1
+
+            elif token.is_keyword("for"):
+                if "function" not in stack:
+                    result.main_locals += 3
+                j = i + 1
+                while j < len(tokens) and tokens[j].kind == "name":
+                    declare(j)
+                    j += 1
+                    if j < len(tokens) and tokens[j].is_symbol(","):
+                        j += 1
+                    else:
+                        break
+
+        elif token.kind == "symbol":
+            if token.text in _openers:
+                stack.append(token.text)
+            elif token.text in _closers and len(stack) > 0:
+                stack.pop()
+            elif token.text == "=" and prev is not None:
+                if len(stack) > 0 and stack[-1] == "{":
+                    # Table constructor key, e.g. { name = value }
+                    if prev.kind == "name":
+                        not_reads.add(i - 1)
+                    continue
+                if len(stack) > 0 and stack[-1] in ("(", "["):
+                    continue
+                targets: list[int] = []
+                fields: list[int] = []
+                j = i - 1
+                while j >= 0:
+                    start, bare = _target_start(tokens, j)
+                    if bare:
+                        targets.append(start)
+                    elif (
+                        j == start + 2
+                        and tokens[start].kind == "name"
+                        and tokens[start + 1].is_symbol(".")
+                    ):
+                        fields.append(start)
+                    if start > 0 and tokens[start - 1].is_symbol(","):
+                        j = start - 2
+                        continue
+                    j = start - 1
+                    break
+                if j >= 0 and tokens[j].is_keyword("local", "for"):
+                    continue
+                for target in targets:
+                    if target not in declared:
+                        assign(target)
+                    not_reads.add(target)
+                for target in fields:
+                    result.assigned_fields.add(
+                        f"{tokens[target].text}.{tokens[target + 2].text}"
+                    )
+
+    for i, token in enumerate(tokens):
+        if token.kind != "name" or i in declared or i in not_reads:
+            continue
+        if i > 0 and tokens[i - 1].is_symbol(".", ":", "::"):
+            continue
+        if i > 0 and tokens[i - 1].is_keyword("goto"):
+            continue
+        result.reads.append(i)
+
+    return result
@@ -0,0 +1,94 @@
+import pytest
+
+from lubber.transform.constants import inline_constants, lua_literal, parse_constants
+
+
+@pytest.mark.parametrize(
+    "source",
+    [
+        "FOO = 1\nfunction set_foo() FOO = 2 end",
+        "FOO = 1\nif x then FOO = 2 end",
+        "FOO = 1\nwhile x do FOO = 2 end",
+        "FOO = 1\nfor i = 1, 2 do BAR, FOO = 1, 2 end",
+        "FOO = 1\nFOO = 2",
+        "FOO = 1\nBAR, FOO = 1, 2",
+        "FOO = 1\nfunction FOO() end",
+        "FOO = 1\nfunction t.f() FOO = 2 end",
+    ],
+)
+def test_reassigned_names_are_mutable(source: str):
+    assert "FOO" not in parse_constants([source])
+
+
+def test_reassigned_in_another_source_is_mutable():
+    assert parse_constants(["FOO = 1", "function f() FOO = 2 end"]) == {}
+
+
+def test_plain_definitions_are_constant():
+    constants = parse_constants(
+        [
+            "FOO = 1\nBAR = FOO << 4 | 2\nNAME = 'a' .. FOO",
+            "local function f() local FOO = 3 end\nt = { FOO = 4 }",
+        ]
+    )
+    assert constants == {"FOO": 1, "BAR": 18, "NAME": "a1"}
+
+
+@pytest.mark.parametrize(
+    "source",
+    [
+        "FOO = f()",
+        "FOO = {}",
+        "FOO = BAR",
+        "FOO = 1 / 0",
+        "FOO = 'a\\n'",
+        "FOO = 1, 2",
+        "Foo = 1",
+    ],
+)
+def test_unsupported_values_are_skipped(source: str):
+    assert parse_constants([source]) == {}
+
+
+@pytest.mark.parametrize(
+    "value, literal",
+    [
+        (True, "true"),
+        (False, "false"),
+        (0, "0"),
+        (42, "42"),
+        (-1, "(-1)"),
+        (-(1 << 63), "(-9223372036854775807 - 1)"),
+        ((1 << 63) - 1, "9223372036854775807"),
+        (1.0, "1.0"),
+        (0.1, "0.1"),
+        (-0.0, "(-0.0)"),
+        (-2.5, "(-2.5)"),
+        (1e100, "1e+100"),
+        ("", '""'),
+        ('say "hi"\\', '"say \\"hi\\"\\\\"'),
+        ("a\nb", '"a\\nb"'),
+        ("\x00\t\x7f", '"\\000\\009\\127"'),
+        ("ü", '"ü"'),
+    ],
+)
+def test_lua_literal(value, literal: str):
+    assert lua_literal(value) == literal
+
+
+@pytest.mark.parametrize("value", [float("inf"), float("-inf"), float("nan"), None])
+def test_lua_literal_unrepresentable(value):
+    assert lua_literal(value) is None
+
+
+def test_inline_constants():
+    source, count = inline_constants(
+        "local a = FOO + FOO\nlocal b = FOO..'x'\nt.FOO = FOO", {"FOO": 1}, set()
+    )
+    assert source == "local a = 1 + 1\nlocal b = (1)..'x'\nt.FOO = 1"
+    assert count == 4
+
+
+def test_inline_constants_skips_shadowed_and_assigned():
+    source = "local FOO = 2\nprint(FOO, BAR)"
+    assert inline_constants(source, {"FOO": 1, "BAR": 2}, {"BAR"}) == (source, 0)
@@ -0,0 +1,54 @@
+from lubber.transform.hoisting import hoist_globals
+from lubber.transform.lexer import tokenize
+from lubber.transform.scope import scan
+
+
+def hoist(sources: list[str], functions: set[str] = None) -> list[str]:
+    assigned: set[str] = set()
+    assigned_fields: set[str] = set()
+    for source in sources:
+        result = scan(tokenize(source))
+        assigned.update(result.assigned)
+        assigned_fields.update(result.assigned_fields)
+    return [
+        hoist_globals(source, functions or set(), assigned, assigned_fields)[0]
+        for source in sources
+    ]
+
+
+def test_hoists_library_fields():
+    (source,) = hoist(["local a = math.floor(x)\nlocal b = math.floor(y)"])
+    assert source == (
+        "local math_floor = math.floor; "
+        "local a = math_floor(x)\nlocal b = math_floor(y)"
+    )
+
+
+def test_hoists_functions_on_the_first_line():
+    (source,) = hoist(["djui_chat(1)\ndjui_chat(2)\nprint(1)"], {"djui_chat"})
+    assert source == "local djui_chat = djui_chat; djui_chat(1)\ndjui_chat(2)\nprint(1)"
+
+
+def test_skips_field_defined_by_function_statement():
+    source = "function math.foo(x) return x end\nprint(math.foo(1), math.foo(2))"
+    assert hoist([source]) == [source]
+
+
+def test_skips_method_defined_on_library():
+    source = "function string:trim() return self end\nstring.trim(a)\nstring.trim(b)"
+    assert hoist([source]) == [source]
+
+
+def test_skips_field_assigned_in_another_file():
+    definition = "math.clamp2 = function(x) return x end"
+    use = "local a = math.clamp2(x)\nlocal b = math.clamp2(y)"
+    assert hoist([definition, use]) == [definition, use]
+
+
+def test_skips_assigned_and_shadowed_globals():
+    sources = [
+        "djui_chat = nil",
+        "djui_chat(1)\ndjui_chat(2)",
+        "local print = print\nprint(1)\nprint(2)",
+    ]
+    assert hoist(sources, {"djui_chat"}) == sources